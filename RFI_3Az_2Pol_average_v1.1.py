@@ -5,7 +5,7 @@
 #  A plot is made for each polarisation (H and V). Each plot contains the
 #  average for the 3 distinct directions Az = 0, 120, 240 degrees. The results
 #  are output to 2 different files, one for each polarisation.
-#  Version 1.1
+#  Version 1.2
 #
 #  Copyright (c) 2019 Nitish Ragoomundun, Mauritius
 #
@@ -33,143 +33,115 @@
 #         only 2 loops
 #       * Function find_files() returns List
 #       * Removed the ActualTimeRanges list
+#  1.2: 15.10.2026
+#       * LoadData() parses only the power column of each data file, the
+#         frequency column is parsed from a single file.
+#       * LoadData() allocates the power array of each configuration once
+#         instead of growing it with numpy.append().
+#       * LoadData() parses the files of each configuration in a single call to
+#         loadtxt() and keeps the columns of the valid files. If their lines
+#         cannot be parsed as a whole, the files are parsed one by one.
+#       * CheckAmp() checks all the files of a configuration at once, using
+#         the mean of all the power values of each file instead of the mean of
+#         40 randomly chosen ones; the random number generator is no longer
+#         used.
+#       * Amplifier gain data are loaded once, while checking the arguments,
+#         instead of once for each configuration.
+#       * The data directory is listed once and find_files() selects the files
+#         in the time range from the time stamps in their names, instead of
+#         probing candidate file names minute by minute with path.isfile().
+#         construct_filename() is replaced by construct_pattern().
+#       * Averages are written to the output files with numpy.savetxt().
+#       * Data files are read concurrently by a pool of threads.
+#       * Power data are stored in single precision, the means are accumulated
+#         in double precision.
+#       * The means of the 6 configurations are stored as the columns of one
+#         array and the amplifier gain is subtracted from all of them at once,
+#         instead of from the data of every file; subtract_AmpGain() is
+#         removed.
+#       * When no display is available, the plots are saved to PNG files named
+#         after the output files instead of being shown.
+#       * Arguments which only need a membership or existence check are
+#         checked with plain if statements instead of raising and catching
+#         exceptions.
+#       * Constants and the functions shared with the 1Az/1Pol script
+#         (find_files(), read_power(), load_AmpGain(), ...) are moved to the
+#         module rfi_common.
+#       * Frequencies are parsed from the lines already read, when they hold
+#         the first valid file, instead of reading that file a second time.
+#       * The power array of a configuration is not copied when none of its
+#         files is rejected.
+#       * The pool of threads reading the data files is shared by the 6
+#         configurations, and the files of the next configuration are read
+#         while those of the current one are parsed.
+#       * The power values of each data file are cached in a .npy file next
+#         to it, which is loaded instead of the text file in later runs. The
+#         cache is shared with the 1Az/1Pol script. It is only used while the
+#         size and modification time of the data file are those saved with
+#         it, and is disabled by setting the environment variable RFI_NOCACHE.
+#       * Option -y skips the confirmation prompt, for scripted runs.
+#       * The names of the files are printed, also in error messages, with
+#         path.basename() instead of removing the data directory with
+#         str.replace(), which failed when the directory was given with a
+#         trailing slash.
 #
 
 from sys import argv
 from os import path
-from random import seed,randint
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime,timedelta
-from numpy import loadtxt,append,zeros,subtract,mean
-import matplotlib.pyplot as plt
-from matplotlib.ticker import EngFormatter
-
+from numpy import loadtxt,savetxt,column_stack,empty,zeros,mean,flatnonzero,float32,float64
 
-###
-###  Constants
-###
+# Constants and helpers shared with the 1Az/1Pol script
+from rfi_common import Headless,NumRows,SpectrumFloor,NumThreads
+from rfi_common import list_datafiles,find_files,file_stamp,load_cache,save_cache,read_power,load_AmpGain
 
-# Number of data values in each TXT data file
-# This is the number of frequency values at which power was measured.
-global NumRows
-NumRows = 461
+import matplotlib
+if Headless:
+    matplotlib.use("Agg")
 
-# Noise floor level of the spectrum analyzer was at -120dB
-# So, we assumed that if on average, signal was below -118 dB,
-# it means that amplifier was not functioning properly.
-global SpectrumFloor
-SpectrumFloor = -118.0
-
-# Seed RNG
-seed(21)
+import matplotlib.pyplot as plt
+from matplotlib.ticker import EngFormatter
 
 
 ###
 ###  Subsidiary Functions
 ###
 
-###  BEGIN Function: Construct filename  ###
-#
-#  Returns full path of the expected data file with the appropriate name.
-#
-def construct_filename(DateTime, Pol, Az, Band, DataPath):
-    MiddleName = DateTime.strftime("%Y%m%d_%H%M") + Pol
-
-    if Az == "0":
-        MiddleName += "000"
-    else:
-        MiddleName += Az
-
-    if Band != "0":
-        MiddleName += "_" + Band
-
-    if DataPath[-1] == "/":
-        return(DataPath + "MRT_" + MiddleName + ".TXT")
-    else:
-        return(DataPath + "/MRT_" + MiddleName + ".TXT")
-
-###  END Function: Construct filename  ###
-
-
-
-###  BEGIN Function: Find files and make list  ###
+###  BEGIN Function: Check if amplifier was working correctly  ###
 #
-#  Returns list of files, start time (time stamp for the first data file),
-#  and end time (time stamp for last data file)
-#  The list is of length NumFiles - the number of data files available for the
-#  input parameters.
+#  Checks all the files (columns of PowArray) at once.
+#  Returns an array holding, for each file:
+#           0 if data valid,
+#           1 if invalid data values due to amplifier malfunction.
 #
-def find_files(StartTime, EndTime, Pol, Az, Band, DataPath):
-    dt1 = timedelta(minutes = 1)
-    dt2 = timedelta(minutes = 15)
-
-    # Create list
-    List = []
-
-    # Find the first file
-    while True:
-        Filename = construct_filename(StartTime, Pol, Az, Band, DataPath)
-        if path.isfile(Filename):
-            List.append(Filename)
-            break
-        else:
-            if StartTime < EndTime - dt1:
-                StartTime += dt1
-            else:
-                print("For configuration -- Pol: {:s}; Az = {:s}".format(Pol, Az))
-                raise FileNotFoundError
-
-
-    DateTime = StartTime + dt2
-
-    while DateTime <= EndTime:
-        Filename = construct_filename(DateTime, Pol, Az, Band, DataPath)
-        if path.isfile(Filename):
-            List.append(Filename)
-            LastOne = DateTime
-            DateTime += dt2
-        else:
-            DateTime -= (dt2 - dt1)
-            while True:
-                Filename = construct_filename(DateTime, Pol, Az, Band, DataPath)
-                if path.isfile(Filename):
-                    break
-                else:
-                    if DateTime <= EndTime:
-                        DateTime += dt1
-                    else:
-                        break
+def CheckAmp(PowArray):
 
-    if len(List) <= 1:
-        print("For configuration -- Pol: {:s}; Az = {:s}".format(Pol, Az))
-        raise IndexError
+    # Mean over all data points of every file
+    Mean = PowArray.mean(axis=0, dtype=float64)
 
-    EndTime = LastOne
-    return(List, StartTime, EndTime)
+    return((Mean <= SpectrumFloor).astype(int))
 
-###  END Function: Find files and make list  ###
+###  END Function: Check if amplifier was working correctly  ###
 
 
 
-###  BEGIN Function: Check if amplifier was working correctly  ###
+###  BEGIN Function: Read data file  ###
 #
-#  Returns: 0 if data valid,
-#           1 if invalid data values due to amplifier malfunction.
+#  Returns the power values of the data file (numpy array of length NumRows)
+#  if they are in the cache, otherwise a tuple holding the stamp of the data
+#  file, to be saved with its cache, and the list of lines of the file.
 #
-def CheckAmp(RawData):
-    Mean = 0.0
+def read_file(Filename):
+    Power = load_cache(Filename)
+    if Power is not None:
+        return(Power)
 
-    # Choose 40 random data points
-    for i in range(0,40):
-        Mean += RawData[randint(0, NumRows-1), 1]
+    Stamp = file_stamp(Filename)
+    with open(Filename, 'r') as fin:
+        return((Stamp, fin.readlines()))
 
-    Mean *= 0.025
-
-    if Mean <= SpectrumFloor:
-        return(1)
-    else:
-        return(0)
-
-###  END Function: Check if amplifier was working correctly  ###
+###  END Function: Read data file  ###
 
 
 
@@ -186,50 +158,111 @@ def LoadData(List):
     # list of numpy arrays
     Data = []
 
-    try:
-        for p in range(0,2):  # Pol
-            for a in range(0,3):  # Az
-                # List for rejected files
-                Rejected = []
-
-                # First file
-                fileIdx = 0
-                while fileIdx < len(List[p*3 + a]):
-                    RawData = loadtxt(fname=List[p*3 + a][fileIdx], delimiter=',')
-                    fileIdx += 1
-
-                    if CheckAmp(RawData) == 0:
-                        # Copy frequencies
-                        FreqArray = RawData[:,0]
-                        # Copy magnitudes
-                        PowArray = RawData[:,1].reshape(NumRows, 1)
-                        break
-                    else:
-                        Rejected.append(List[p*3 + a][fileIdx-1])
+    FreqArray = None
 
-                # Loop through the rest of the list of files, copy data into array
-                while fileIdx < len(List[p*3 + a]):
-                    RawData = loadtxt(fname=List[p*3 + a][fileIdx], delimiter=',')
-
-                    if CheckAmp(RawData) == 0:
-                        PowArray = append(PowArray, RawData[:,1].reshape(NumRows,1), axis=1)
+    try:
+        # The files are read by a pool of threads shared by the 6
+        # configurations; Pool.map() returns the results in the order of the
+        # list of files. Reading of the files of the next configuration is
+        # started before the files of the current one are parsed, so that
+        # reading and parsing of successive configurations overlap.
+        with ThreadPoolExecutor(max_workers=NumThreads) as Pool:
+            Reads = Pool.map(read_file, List[0])
+
+            for p in range(0,2):  # Pol
+                for a in range(0,3):  # Az
+                    Files = List[p*3 + a]
+
+                    # List for rejected files
+                    Rejected = []
+
+                    # Power data of all the files, one file per row, stored
+                    # in single precision to halve the memory used
+                    AllPowT = empty((len(Files), NumRows), dtype=float32)
+
+                    # Copy the power values of the files found in the cache,
+                    # and gather the lines of the other files, so that they
+                    # are parsed in a single call to loadtxt()
+                    Lines = []
+                    Parsed = []
+                    Stamps = []
+                    fileIdx = 0
+                    for Read in Reads:
+                        if isinstance(Read, tuple):
+                            Stamp, Read = Read
+                            if len(Read) < NumRows:
+                                raise IndexError
+
+                            Lines.extend(Read[:NumRows])
+                            Parsed.append(fileIdx)
+                            Stamps.append(Stamp)
+                        else:
+                            AllPowT[fileIdx] = Read
+
+                        fileIdx += 1
+
+                    if p*3 + a < 5:
+                        Reads = Pool.map(read_file, List[p*3 + a + 1])
+
+                    if len(Parsed) != 0:
+                        try:
+                            Power = loadtxt(Lines, delimiter=',', usecols=1).reshape(len(Parsed), NumRows)
+                        except ValueError:
+                            # The lines cannot be parsed as a whole, e.g. when
+                            # blank lines, which loadtxt() skips, are among
+                            # the first NumRows lines of a file. Parse the
+                            # files one by one instead; an error is then
+                            # raised for the faulty file, if any.
+                            for fileIdx in Parsed:
+                                Power = read_power(Files[fileIdx])
+                                if len(Power) != NumRows:
+                                    raise IndexError
+
+                                AllPowT[fileIdx] = Power
+
+                            # The frequencies cannot be taken from the lines
+                            Parsed = []
+                        else:
+                            # Save the parsed values to the cache for later runs
+                            AllPowT[Parsed] = Power
+                            for Idx, Values, Stamp in zip(Parsed, Power, Stamps):
+                                save_cache(Files[Idx], Values, Stamp)
+
+                    # Shape (NumRows x NumFiles)
+                    AllPow = AllPowT.T
+
+                    # Check all the files and keep the indices of the valid
+                    # ones
+                    Invalid = CheckAmp(AllPow)
+                    Accepted = flatnonzero(Invalid == 0)
+                    for fileIdx in flatnonzero(Invalid):
+                        Rejected.append(Files[fileIdx])
+
+                    # Copy frequencies from the first valid file, from the
+                    # lines already read if it is not in the cache
+                    if FreqArray is None and len(Accepted) != 0:
+                        if Accepted[0] in Parsed:
+                            FirstRow = Parsed.index(Accepted[0])*NumRows
+                            FreqArray = loadtxt(Lines[FirstRow:FirstRow + NumRows], delimiter=',', usecols=0)
+                        else:
+                            FreqArray = loadtxt(fname=Files[Accepted[0]], delimiter=',', usecols=0, max_rows=NumRows)
+
+                    # Print the list of rejected files, if any
+                    if (len(Rejected) != 0):
+                        print()
+                        print("-> For configuration -- Polarisation: {:s}; Azimuth: {:s} deg,".format(Pol[p], Az[a]))
+                        print("-> There were  {:d}  rejected file(s):-".format(len(Rejected)))
+                        for Filename in Rejected:
+                            print("{:s}".format(path.basename(Filename)))
+                        print("-----------------------------------------------------------------------")
+
+
+                    # Add numpy power array of the valid files to list. The
+                    # array is only copied if some files have been rejected.
+                    if len(Rejected) == 0:
+                        Data.append(AllPow)
                     else:
-                        Rejected.append(List[p*3 + a][fileIdx])
-
-                    fileIdx += 1
-
-                # Print the list of rejected files, if any
-                if (len(Rejected) != 0):
-                    print()
-                    print("-> For configuration -- Polarisation: {:s}; Azimuth: {:s} deg,".format(Pol[p], Az[a]))
-                    print("-> There were  {:d}  rejected file(s):-".format(len(Rejected)))
-                    for i in range(0, len(Rejected)):
-                        print("{:s}".format(Rejected[i].replace(DataPath+"/", "")))
-                    print("-----------------------------------------------------------------------")
-
-
-                # Add numpy power array to list
-                Data.append(PowArray)
+                        Data.append(AllPow[:,Accepted])
 
 
         # Return data
@@ -237,42 +270,21 @@ def LoadData(List):
 
 
     except OSError:
-        raise OSError("Error when loading file {:s}".format(List[p*3 + a][fileIdx]))
-    except IndexError:
-        raise IndexError("Error when loading data from file {:s} into array.".format(List[p*3 + a][fileIdx]))
+        raise OSError("Error when loading file {:s}".format(path.basename(List[p*3 + a][fileIdx])))
+    except (IndexError, ValueError):
+        raise IndexError("Error when loading data from file {:s} into array.".format(path.basename(List[p*3 + a][fileIdx])))
 
 ###  END Function: Access files and load data into arrays  ###
 
 
 
-###  BEGIN Function: Subtract amplifier gain from raw data  ###
-#
-#  Returns array of shape (NumRows x NumFiles), same shape as
-#  the InputData array passed to function.
-#
-def subtract_AmpGain(InputData, Band):
-
-    # Open amplifier gain data
-    AmpGain = loadtxt(fname="AmpGain_band"+Band+".csv", delimiter=',')
-
-    # Subtract
-    Corrected = InputData
-    for col in range(0, InputData.shape[1]):
-        Corrected[:,col] = subtract(InputData[:,col], AmpGain[:,1])
-
-    return(Corrected)
-
-###  END Function: Subtract amplifier gain from raw data  ###
-
-
-
 ###  BEGIN Function: Print help  ###
 #
 #  Prints message and returns 0
 #
 def print_help(ScriptName):
     print()
-    print("Usage: {:s} STARTDATE ENDDATE BAND DATADIR".format(ScriptName))
+    print("Usage: {:s} [-y] STARTDATE ENDDATE BAND DATADIR".format(ScriptName))
     print("\nSTARTDATE: initial date for averaging in format YYYYMMDD")
     print("ENDDATE: closing date for range of data to be considered in format YYYYMMDD")
     print("BAND: frequency band of measurements, the accepted inputs for this parameter")
@@ -281,6 +293,7 @@ def print_help(ScriptName):
     print("      1 :     325 MHz --     329 MHz (bandwidth:   4 MHz)")
     print("      2 : 327.275 MHz -- 327.525 MHz (bandwidth: 250 KHz)\n")
     print("DATADIR: path of the directory holding the .TXT data files\n")
+    print("-y: proceed with calculations without asking for confirmation\n")
     print("Example:")
     print("{:s} 20190415 20190430 1 ./txtDataFiles\n".format(ScriptName))
     print("The above command will look for data in directory txtDataFiles found in current")
@@ -349,10 +362,12 @@ def print_runconfig(List, StartTimes, EndTimes, Band):
 ###
 
 ###  BEGIN Parsing of command line arguments  ###
-try:
-    if len(argv) <= 4:
-        raise OSError
-except OSError:
+# Option -y skips the confirmation prompt, for scripted runs
+Confirmed = "-y" in argv[1:]
+if Confirmed:
+    argv.remove("-y")
+
+if len(argv) <= 4:
     print_help(argv[0])
     exit(1)
 
@@ -398,10 +413,7 @@ except ValueError:
 
 
 # Check validity of BAND (argv[3])
-try:
-    if argv[3] not in {"0", "1", "2"}:
-        raise ValueError
-except ValueError:
+if argv[3] not in {"0", "1", "2"}:
     print("Invalid frequency band label!")
     exit(4)
 
@@ -409,21 +421,18 @@ Band = argv[3]
 
 
 # Check validity of DATADIR (argv[4])
-try:
-    if not path.isdir(argv[4]):
-        raise ValueError
-except ValueError:
+if not path.isdir(argv[4]):
     print("Cannot access {:s}".format(argv[4]))
     exit(5)
 
 DataPath = argv[4]
 
 
-# Check if amplifier gain data files are accessible
+# Load amplifier gain data for the band once; it is subtracted from the
+# means of each of the 6 configurations.
 try:
-    if not path.isfile("AmpGain_band"+Band+".csv"):
-        raise FileNotFoundError
-except FileNotFoundError:
+    AmpGain = load_AmpGain(Band)
+except OSError:
     print("Amplifier gain data file {:s} missing!".format("AmpGain_band"+Band+".csv"))
     exit(6)
 
@@ -440,13 +449,16 @@ Az = ["0", "120", "240"]
 ###  BEGIN Browse through file names  ###
 
 try:
+    # List the data directory once for the 6 configurations
+    Existing = list_datafiles(DataPath)
+
     # Search for files in time range and fill array of file names
     Files = []
     StartTimes = []
     EndTimes = []
     for p in range(0,2):  # Pol
         for a in range(0,3):  # Az
-            tmp_Files, tmp_Start, tmp_End = find_files(StartTime, EndTime, Pol[p], Az[a], Band, DataPath)
+            tmp_Files, tmp_Start, tmp_End = find_files(StartTime, EndTime, Pol[p], Az[a], Band, DataPath, Existing)
 
             # Append list of files and times to the relevant arrays
             Files.append(tmp_Files)
@@ -454,9 +466,11 @@ try:
             EndTimes.append(tmp_End)
 
 except FileNotFoundError:
+    print("For configuration -- Pol: {:s}; Az = {:s}".format(Pol[p], Az[a]))
     print("Error: Cannot find data files within input time interval with corresponding parameters.")
     exit(90)
 except IndexError:
+    print("For configuration -- Pol: {:s}; Az = {:s}".format(Pol[p], Az[a]))
     print("Error: Time range contains only 1 file for corresponding parameters, cannot average!")
     exit(91)
 
@@ -469,7 +483,10 @@ except IndexError:
 # First print runtime configuration settings and ask user for
 # confirmation before proceeding.
 print_runconfig(Files, StartTimes, EndTimes, Band)
-Ans = input("\nDo you wish to proceed with calculations? (y/n)  ")
+if Confirmed:
+    Ans = "y"
+else:
+    Ans = input("\nDo you wish to proceed with calculations? (y/n)  ")
 if Ans != "Y" and Ans != "y":
     exit(100)
 else:
@@ -477,12 +494,10 @@ else:
     try:
         Frequency, InputData = LoadData(Files)
     except OSError as error1:
-        msg = str(error1)
-        print(msg.replace(DataPath+"/", ""))
+        print(error1)
         exit(101)
     except IndexError as error2:
-        msg = str(error2)
-        print(msg.replace(DataPath+"/", ""))
+        print(error2)
         exit(102)
 
 ###  END Opening files and loading data in array  ###
@@ -512,31 +527,25 @@ except OSError:
 
 ###  BEGIN Averaging and plotting  ###
 
-Mean = []
-for i in range(0,6):  # 2 Pol x 3 Az
-    # Subtract amplifier gain from data values for relevant band
-    CorrectedData = subtract_AmpGain(InputData[i], Band)
-
+# Means of amplitudes, one column per configuration (2 Pol x 3 Az)
+Mean = empty((NumRows, 6))
+for i in range(0,6):
     # Calculate mean of amplitudes for each frequency
-    # (across columns/along rows: axis = 1)
-    Mean.append(mean(CorrectedData, axis=1))
+    # (across columns/along rows: axis = 1), accumulated in double precision.
+    mean(InputData[i], axis=1, dtype=float64, out=Mean[:,i])
+
+# Since the amplifier gain is the same for all the files, subtracting it
+# from the mean is the same as subtracting it from each file. It is
+# subtracted from the means of all the configurations at once.
+Mean -= AmpGain.reshape(NumRows,1)
 
 
 # Output results to csv file
 print()
 print("Writing output results for Polarisation H to {:s} and Polarisation V to {:s}".format(outfilenameH, outfilenameV))
-for i in range(0, len(Frequency)):
-    # Write frequency values
-    fout_H.write("{:f}".format(Frequency[i]))
-    fout_V.write("{:f}".format(Frequency[i]))
-
-    # Write averages for each direction
-    for a in range(0,3):  # Az
-        fout_H.write(",{:f}".format(Mean[a][i]))
-        fout_V.write(",{:f}".format(Mean[3 + a][i]))
-
-    fout_H.write("\n")
-    fout_V.write("\n")
+# Each row holds the frequency and the averages for each direction
+savetxt(fout_H, column_stack((Frequency, Mean[:,0:3])), fmt="%f", delimiter=",")
+savetxt(fout_V, column_stack((Frequency, Mean[:,3:6])), fmt="%f", delimiter=",")
 
 fout_H.close()
 fout_V.close()
@@ -580,12 +589,18 @@ for p in range(0,2):  # Pol
     ax[p].set_ylabel("Mean power / dBm", fontsize=12)
     ax[p].grid(True)
     for a in range(0,3):  # Az
-        ax[p].plot(Frequency, Mean[p*3 + a], color=colours[a], label="Az = "+Az[a]+chr(176))
+        ax[p].plot(Frequency, Mean[:,p*3 + a], color=colours[a], label="Az = "+Az[a]+chr(176))
 
     # Legend
     ax[p].legend(loc="upper right", bbox_to_anchor=(0.93,0.97), frameon=True)
 
-plt.show()
+if Headless:
+    for p, outfilename in [(0, outfilenameH), (1, outfilenameV)]:  # Pol
+        plotfilename = outfilename.replace(".csv", ".png")
+        print("No display available, saving plot to {:s}".format(plotfilename))
+        fig[p].savefig(plotfilename, dpi=150)
+else:
+    plt.show()
 
 ###  END Averaging and plotting  ###
 
@@ -2,7 +2,7 @@
 #
 #  Script to make spectrogram plots of the RFI data for the Mauritius Deuterium
 #  Telescope (MDT) location at Bras d'Eau.
-#  Version 1.3
+#  Version 1.4
 #
 #  Copyright (c) 2019 Nitish Ragoomundun, Mauritius
 #
@@ -32,15 +32,71 @@
 #
 # 1.3: 16.08.2019
 #      * Added correction for amplifier gains.
+# 1.4: 15.10.2026
+#      * construct_filename() formats the time stamp without strftime() and
+#        the constant parts of the file names are computed once.
+#      * CheckAmp() uses the mean of all the power values of a file instead of
+#        the mean of 40 randomly chosen ones; the RNG is no longer used.
+#      * find_files() steps through time as integer numbers of minutes and
+#        construct_filename() takes the minute instead of a datetime.
+#      * find_files() lists the data directory once and finds the next file
+#        after a missing one by bisection in the sorted time stamps, instead
+#        of probing file names minute by minute with path.isfile().
+#      * Arguments which only need a membership or existence check are
+#        checked with plain if statements instead of raising and catching
+#        exceptions.
+#      * The amplifier gain is subtracted from the power values as they are
+#        stored by LoadData() instead of from a new copy of the data array.
+#      * LoadData() allocates the power array once, with one file per row, and
+#        fills in the rows of the valid files, instead of growing the array
+#        with numpy.append() for every file.
+#      * Only the column of magnitudes of the data files is parsed, and the
+#        column of frequencies of the first one.
+#      * The data files are read concurrently by a pool of threads.
+#      * When no display is available, the spectrogram is saved to a PNG file
+#        instead of being shown.
+#      * Constants and the functions shared with the averaging scripts
+#        (construct_suffix(), construct_pattern(), read_power(), CheckAmp())
+#        are imported from the module rfi_common.
+#      * Option -y skips the confirmation prompt, for scripted runs.
+#      * The power values of each data file are cached in a .npy file next to
+#        it, shared with the averaging scripts, which is loaded instead of the
+#        text file in later runs. The cache is only used while the size and
+#        modification time of the data file are those saved with it, and is
+#        disabled by setting the environment variable RFI_NOCACHE.
+#      * LoadData() checks whether the frequencies were read with a variable
+#        initialised to None instead of searching the local names with dir().
+#      * The power values are stored in single precision.
+#      * Fixed print_runconfig() reporting the second file as the first one
+#        when the list starts with a file.
+#      * The spectrogram is drawn as a single image with imshow() instead of
+#        a mesh of cells with pcolormesh(), as the grid is uniform.
+#      * Fixed the labels of the time axis, whose number did not match the
+#        number of ticks.
+#      * The names of the files are printed, also in error messages, with
+#        path.basename() instead of removing the data directory with
+#        str.replace(), which failed when the directory was given with a
+#        trailing slash.
+#      * find_files() returns a new list of file names, like the version in
+#        rfi_common, instead of filling a list passed by the caller.
 #
 
 
 from sys import argv
-from os import path
-from time import time
-from random import seed,randint
+from os import path,listdir
+from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime,timedelta
-from numpy import loadtxt,append,ones,subtract,mean,arange,meshgrid
+from numpy import loadtxt,full,arange,float32
+
+# Constants and helpers shared with the averaging scripts
+from rfi_common import Headless,NumRows,SpectrumFloor,NumThreads
+from rfi_common import construct_suffix,construct_pattern,read_power,CheckAmp
+
+import matplotlib
+if Headless:
+    matplotlib.use("Agg")
+
 import matplotlib.pyplot as plt
 from matplotlib.ticker import EngFormatter,MaxNLocator
 from matplotlib.colors import BoundaryNorm
@@ -50,16 +106,6 @@ from matplotlib.colors import BoundaryNorm
 ###  Constants
 ###
 
-# Number of data values in each TXT data file
-global NumRows
-NumRows = 461
-
-# Noise floor level of the spectrum analyzer was at -120dB
-# So, we assumed that if on average, signal was below -118 dB,
-# it means that amplifier was not functioning properly.
-global SpectrumFloor
-SpectrumFloor = -118.0
-
 # Amplifiers gain in each band
 # +20 dB in band 0
 # +40 dB in bands 1 and 2
@@ -67,189 +113,203 @@ global Gain
 Gain = [20, 40, 40]
 #        0   1   2
 
-# Seed RNG
-seed(time())
-
 
 ###
 ###  Subsidiary Functions
 ###
 
 ###  BEGIN Construct filename  ###
-def construct_filename(DateTime, Pol, Az, Band, DataPath):
-    MiddleName = DateTime.strftime("%Y%m%d_%H%M") + Pol
+def construct_filename(Minute, Dates, Suffix):
+    # Minute counts the minutes from midnight of the first day and Dates
+    # holds the beginning of the file names (path and date) for each day,
+    # so no datetime object is needed in the search of find_files().
+    Day, Minute = divmod(Minute, 1440)
+    return(f"{Dates[Day]}{Minute // 60:02d}{Minute % 60:02d}{Suffix}")
 
-    if Az == "0":
-        MiddleName += "000"
-    else:
-        MiddleName += Az
+###  END Construct filename  ###
 
-    if Band != "0":
-        MiddleName += "_" + Band
 
-    if DataPath[-1] == "/":
-        return(DataPath + "MRT_" + MiddleName + ".TXT")
-    else:
-        return(DataPath + "/MRT_" + MiddleName + ".TXT")
 
-###  END Construct filename  ###
+###  BEGIN List time stamps of existing files  ###
+def list_stamps(Origin, Start, End, Pattern, DataPath):
+    # Returns the sorted list of time stamps, in minutes from Origin, of the
+    # data files in DataPath matching Pattern, as returned by
+    # construct_pattern(), between Start and End.
+    Stamps = []
+    for Filename in listdir(DataPath):
+        Match = Pattern.fullmatch(Filename)
+        if Match is None:
+            continue
 
+        # Time stamp in format YYYYMMDD_HHMM
+        Stamp = Match.group(1)
+        try:
+            Date = datetime(int(Stamp[0:4]), int(Stamp[4:6]), int(Stamp[6:8]))
+        except ValueError:
+            continue
 
+        Minute = (Date - Origin) // timedelta(minutes = 1) + int(Stamp[9:11])*60 + int(Stamp[11:13])
+        if Start <= Minute <= End:
+            Stamps.append(Minute)
 
-###  BEGIN Find files and make list  ###
-def find_files(StartTime, EndTime, Pol, Az, Band, DataPath, List):
-    # Clean list
-    List.clear()
+    Stamps.sort()
+    return(Stamps)
 
-    dt1 = timedelta(minutes = 1)
-    dt2 = timedelta(minutes = 15)
-    DateTime = StartTime  # temporary storage
+###  END List time stamps of existing files  ###
 
-    # Find the first file
-    while True:
-        Filename = construct_filename(StartTime, Pol, Az, Band, DataPath)
 
-        if path.isfile(Filename):
 
-            # If there is a big gap between start of the day to the start
-            # of the data, fill the gap with null
-            if StartTime > DateTime + dt2:
-                while DateTime < StartTime:
-                    List.append("0")
-                    DateTime += dt2
+###  BEGIN Find files and make list  ###
+def find_files(StartTime, EndTime, Pol, Az, Band, DataPath):
+    # Create list
+    List = []
+
+    # Time stamps are handled as integer numbers of minutes from midnight
+    # of the start date; datetime objects are only made once at the end.
+    Origin = datetime(StartTime.year, StartTime.month, StartTime.day)
+    Start = (StartTime - Origin) // timedelta(minutes = 1)
+    End = (EndTime - Origin) // timedelta(minutes = 1)
+
+    # Parts of the file names which do not depend on the time of the day
+    Prefix = DataPath.rstrip("/") + "/MRT_"
+    Suffix = construct_suffix(Pol, Az, Band)
+    Dates = []
+    for Day in range(0, End // 1440 + 1):
+        Date = Origin + timedelta(days = Day)
+        Dates.append(f"{Prefix}{Date.year:04d}{Date.month:02d}{Date.day:02d}_")
+
+    dt1 = 1
+    dt2 = 15
+
+    # Time stamps of the existing files, sorted, so that the next file after
+    # a given time is found by bisection instead of probing every minute
+    Stamps = list_stamps(Origin, Start, End + dt1, construct_pattern(Pol, Az, Band), DataPath)
+    Existing = set(Stamps)
+
+    Minute = Start  # temporary storage
 
-            List.append(Filename)
-            break
+    # Find the first file
+    Idx = bisect_left(Stamps, Start)
+    if Idx == len(Stamps) or Stamps[Idx] > max(Start, End - dt1):
+        raise FileNotFoundError
 
-        else:
-            if StartTime < EndTime - dt1:
-                StartTime += dt1
-            else:
-                raise FileNotFoundError
+    Start = Stamps[Idx]
 
-    DateTime = StartTime + dt2
+    # If there is a big gap between start of the day to the start
+    # of the data, fill the gap with null
+    if Start > Minute + dt2:
+        while Minute < Start:
+            List.append("0")
+            Minute += dt2
+
+    List.append(construct_filename(Start, Dates, Suffix))
 
-    while DateTime <= EndTime:
-        Filename = construct_filename(DateTime, Pol, Az, Band, DataPath)
+    Minute = Start + dt2
 
-        if path.isfile(Filename):
+    while Minute <= End:
+        if Minute in Existing:
+            Filename = construct_filename(Minute, Dates, Suffix)
 
-            LastOne = DateTime
+            LastOne = Minute
 
             # If there is a big gap between previous file's timestamp and
             # the next file, fill the gap with null
-            if DateTime > LastOne + dt2:
-                while LastOne < DateTime:
+            if Minute > LastOne + dt2:
+                while LastOne < Minute:
                     List.append("0")
                     LastOne += dt2
 
             List.append(Filename)
-            DateTime += dt2
+            Minute += dt2
 
         else:
-            DateTime -= (dt2 - dt1)
-            while True:
-                Filename = construct_filename(DateTime, Pol, Az, Band, DataPath)
-                if path.isfile(Filename):
-                    break
-                else:
-                    if DateTime <= EndTime:
-                        DateTime += dt1
-                    else:
-                        break
+            # Next file after the last one found, if any
+            Idx = bisect_left(Stamps, Minute - (dt2 - dt1))
+            if Idx == len(Stamps):
+                break
+
+            Minute = Stamps[Idx]
 
     if len(List) <= 1:
         raise IndexError
 
     # If there is a big gap between the last file's timestamp and
     # the end of the day, fill the gap with null
-    if EndTime > LastOne + dt2:
-        while LastOne < EndTime:
+    if End > LastOne + dt2:
+        while LastOne < End:
             List.append("0")
             LastOne += dt2
 
-    EndTime = LastOne - dt2
+    StartTime = Origin + timedelta(minutes = Start)
+    EndTime = Origin + timedelta(minutes = LastOne - dt2)
 
-    return(StartTime,EndTime)
+    return(List,StartTime,EndTime)
 
 ###  END Find files and make list  ###
 
 
 
-###  BEGIN Check if amplifier was working correctly  ###
-def CheckAmp(RawData):
-    Mean = 0.0
-
-    # Choose 40 random data points, sum and divide by 40
-    for i in range(0,40):
-        Mean += RawData[randint(0, NumRows-1), 1]
+###  BEGIN Read data file  ###
+def read_file(Filename):
+    # Missing files are marked by "0" in the list of files
+    if Filename == "0":
+        return(None)
 
-    Mean *= 0.025
-
-    if Mean <= SpectrumFloor:
-        return(1)
-    else:
-        return(0)
+    # Only the magnitudes, the frequencies are the same for all files. They
+    # are loaded from the .npy cache if possible.
+    return(read_power(Filename))
 
-###  END Check if amplifier was working correctly  ###
+###  END Read data file  ###
 
 
 
 ###  BEGIN Access files and load data into arrays  ###
-def LoadData(List, Ideal_NFiles):
+def LoadData(List, Ideal_NFiles, AmpGain):
 
     # List for rejected files
     Rejected = []
 
     NumFiles = 0
 
-    try:
-        # First file
-        fileIdx = 0
-        if List[fileIdx] == "0":
-            PowArray = SpectrumFloor * ones((NumRows,1))
-        else:
-            RawData = loadtxt(fname=List[0], delimiter=',')
-
-            # Copy frequencies
-            FreqArray = RawData[:,0]
-
-            if CheckAmp(RawData) == 0:
-                # Copy magnitudes
-                PowArray = RawData[:,1].reshape(NumRows,1)
-                NumFiles += 1
-            else:
-                PowArray = SpectrumFloor * ones((NumRows,1))
-                Rejected.append(List[0])
-
-
-        # Loop through the rest of the list of files, copy data into array
-        fileIdx += 1
-        while fileIdx < len(List):
-            if List[fileIdx] == "0":
-                PowArray = append(PowArray, SpectrumFloor * ones((NumRows,1)), axis=1)
-            else:
-                RawData = loadtxt(fname=List[fileIdx], delimiter=',')
+    # Power array allocated once, with one file per row so that the values
+    # of a file are written contiguously. Missing and rejected files keep
+    # the level of the noise floor. The values are only plotted, so they
+    # are stored in single precision to halve the memory used.
+    # The amplifier gain is subtracted as the values are stored.
+    PowArray = full((len(List), NumRows), SpectrumFloor - AmpGain, dtype=float32)
 
-                if "FreqArray" not in dir():
-                    FreqArray = RawData[:,0]
+    # Frequencies, read from the first file found
+    FreqArray = None
 
-                if CheckAmp(RawData) == 0:
-                    PowArray = append(PowArray, RawData[:,1].reshape(NumRows,1), axis=1)
-                    NumFiles += 1
-                else:
-                    PowArray = append(PowArray, SpectrumFloor * ones((NumRows,1)), axis=1)
-                    Rejected.append(List[fileIdx])
+    try:
+        # The files are read by a pool of threads so that disk access and
+        # parsing overlap; Pool.map() returns the results in the order of List.
+        fileIdx = 0
+        with ThreadPoolExecutor(max_workers=NumThreads) as Pool:
+            for Power in Pool.map(read_file, List):
+                if Power is not None:
+                    if len(Power) != NumRows:
+                        raise IndexError
+
+                    # Copy frequencies from the first file found
+                    if FreqArray is None:
+                        FreqArray = loadtxt(fname=List[fileIdx], delimiter=',', usecols=0, max_rows=NumRows)
+
+                    if CheckAmp(Power) == 0:
+                        PowArray[fileIdx] = Power - AmpGain
+                        NumFiles += 1
+                    else:
+                        Rejected.append(List[fileIdx])
 
-            fileIdx += 1
+                fileIdx += 1
 
 
         if len(Rejected) != 0:
             print()
             print("-> These files had invalid values of signal power:")
             print("-> (possibly indicating amplifier malfunction)")
-            for i in range(0, len(Rejected)):
-                print("{:s}".format(Rejected[i].replace(DataPath+"/", "")))
+            for Filename in Rejected:
+                print("{:s}".format(path.basename(Filename)))
 
             print("\n-> Total number of useful files therefore: {:d}".format(NumFiles))
 
@@ -259,14 +319,15 @@ def LoadData(List, Ideal_NFiles):
             print()
 
 
-        # Return numpy arrays
-        return(FreqArray, PowArray)
+        # Return numpy arrays, the power array of shape
+        # (NumRows x number of files) as expected for plotting
+        return(FreqArray, PowArray.T)
 
 
     except OSError:
-        raise OSError("Error when loading file {:s}.".format(List[fileIdx]))
-    except IndexError:
-        raise IndexError("Error when loading data from file {:s} into array.".format(List[fileIdx]))
+        raise OSError("Error when loading file {:s}.".format(path.basename(List[fileIdx])))
+    except (IndexError, ValueError):
+        raise IndexError("Error when loading data from file {:s} into array.".format(path.basename(List[fileIdx])))
 
 ###  END Access files and load data into arrays  ###
 
@@ -275,7 +336,7 @@ def LoadData(List, Ideal_NFiles):
 ###  BEGIN Print help  ###
 def print_help(ScriptName):
     print()
-    print("Usage: {:s} DATE POL AZ BAND DATADIR".format(ScriptName))
+    print("Usage: {:s} [-y] DATE POL AZ BAND DATADIR".format(ScriptName))
     print("\nDATE: date in format YYYYMMDD for which spectrogram will be plotted")
     print("POL: polarisation (only parameters \'H\' or \'V\' are accepted)")
     print("AZ: direction along which measurements were taken, in terms of Azimuth angle)")
@@ -286,6 +347,7 @@ def print_help(ScriptName):
     print("      1 :     325 MHz --     329 MHz (bandwidth:   4 MHz)")
     print("      2 : 327.275 MHz -- 327.525 MHz (bandwidth: 250 KHz)\n")
     print("DATADIR: path of the directory holding the .TXT data files\n")
+    print("-y: proceed with calculations without asking for confirmation\n")
     print("Example:")
     print("{:s} 20190307 H 240 1 ./txtDataFiles\n".format(ScriptName))
     print("The above command will look for data in directory txtDataFiles found in current")
@@ -304,18 +366,10 @@ def print_runconfig(List, Ideal_NFiles, StartTime, EndTime, TimeRange, Pol, Az,
 
     # Look for first file, last file and total number of potentially valid
     # file in the array
-    firstfileIdx = 0
-    lastfileIdx = 0
-    NumFiles = 0
-    for i in range(0, len(List)):
-        if List[i] == "0":
-            continue
-        else:
-            if firstfileIdx == 0:
-                firstfileIdx = i
-
-            lastfileIdx = i
-            NumFiles += 1
+    Found = [i for i, Filename in enumerate(List) if Filename != "0"]
+    firstfileIdx = Found[0]
+    lastfileIdx = Found[-1]
+    NumFiles = len(Found)
 
     # String to describe polarisation
     if Pol == "H":
@@ -332,8 +386,8 @@ def print_runconfig(List, Ideal_NFiles, StartTime, EndTime, TimeRange, Pol, Az,
         sBand = "327.275 MHz -- 327.525 MHz (bandwidth: 250 KHz)"
 
     print()
-    print("First file:\t{:s}".format(List[firstfileIdx].replace(DataPath+"/", "")))
-    print("Last file:\t{:s}".format(List[lastfileIdx].replace(DataPath+"/", "")))
+    print("First file:\t{:s}".format(path.basename(List[firstfileIdx])))
+    print("Last file:\t{:s}".format(path.basename(List[lastfileIdx])))
 
     print()
     print("Time range and current parameters:")
@@ -362,10 +416,12 @@ def print_runconfig(List, Ideal_NFiles, StartTime, EndTime, TimeRange, Pol, Az,
 ###
 
 ###  BEGIN Parsing of command line arguments  ###
-try:
-    if len(argv) <= 5:
-        raise OSError
-except OSError:
+# Option -y skips the confirmation prompt, for scripted runs
+Confirmed = "-y" in argv[1:]
+if Confirmed:
+    argv.remove("-y")
+
+if len(argv) <= 5:
     print_help(argv[0])
     exit(1)
 
@@ -388,10 +444,7 @@ except ValueError:
 
 
 # Check validity of POL (argv[2])
-try:
-    if argv[2] not in {"H", "V"}:
-        raise ValueError
-except ValueError:
+if argv[2] not in {"H", "V"}:
     print("Invalid polarisation!")
     exit(3)
 
@@ -399,10 +452,7 @@ Pol = argv[2]
 
 
 # Check validity of DIR (argv[3])
-try:
-    if argv[3] not in {"0", "120", "240"}:
-        raise ValueError
-except ValueError:
+if argv[3] not in {"0", "120", "240"}:
     print("Invalid Azimuth angle for direction!")
     exit(4)
 
@@ -410,10 +460,7 @@ Az = argv[3]
 
 
 # Check validity of BAND (argv[4])
-try:
-    if argv[4] not in {"0", "1", "2"}:
-        raise ValueError
-except ValueError:
+if argv[4] not in {"0", "1", "2"}:
     print("Invalid frequency band label!")
     exit(5)
 
@@ -421,10 +468,7 @@ Band = argv[4]
 
 
 # Check validity of DATADIR (argv[5])
-try:
-    if not path.isdir(argv[5]):
-        raise ValueError
-except ValueError:
+if not path.isdir(argv[5]):
     print("Cannot access {:s}".format(argv[5]))
     exit(6)
 
@@ -436,10 +480,10 @@ DataPath = argv[5]
 
 ###  BEGIN Browse through file names  ###
 
-Files = []
 try:
-    # Search for files in time range and fill array of file names
-    find_files(StartTime, EndTime, Pol, Az, Band, DataPath, Files)
+    # Search for files in time range and make array of file names
+    # The time range of the spectrogram stays the whole day.
+    Files = find_files(StartTime, EndTime, Pol, Az, Band, DataPath)[0]
 
 except FileNotFoundError:
     print("Error: Cannot find data files within input time interval with corresponding parameters.")
@@ -467,20 +511,21 @@ Ideal_numfiles = TimeRange // timedelta(minutes=15)
 print_runconfig(Files, Ideal_numfiles, StartTime, EndTime, TimeRange, Pol, Az, Band, DataPath)
 
 # Prompt user
-Ans = input("Do you wish to proceed with calculations? (y/n)  ")
+if Confirmed:
+    Ans = "y"
+else:
+    Ans = input("Do you wish to proceed with calculations? (y/n)  ")
 if Ans != "Y" and Ans != "y":
     exit(90)
 else:
     # Proceed with normal execution of script
     try:
-        Frequency, InputData = LoadData(Files, Ideal_numfiles)
+        Frequency, InputData = LoadData(Files, Ideal_numfiles, Gain[int(Band)])
     except OSError as error1:
-        msg = str(error1)
-        print(msg.replace(DataPath+"/", ""))
+        print(error1)
         exit(91)
     except IndexError as error2:
-        msg = str(error2)
-        print(msg.replace(DataPath+"/", ""))
+        print(error2)
         exit(92)
 
 ###  END Opening files and loading data in array  ###
@@ -489,9 +534,6 @@ else:
 
 ###  BEGIN Plotting  ###
 
-# Subtract amplifier gain
-InputData = subtract(InputData, Gain[int(Band)])
-
 # Colour map and spectrum representing range of dB
 cmap = plt.get_cmap('jet')
 levels = MaxNLocator(nbins=64).tick_values(InputData.min(), InputData.max())
@@ -503,14 +545,13 @@ ax = plt.subplot(1,1,1)
 ax.set_title("RFI spectrogram -- {:s} (Pol {:s}, Az {:s}{:s}, Band {:s})".format(StartTime.strftime("%d %B %Y"), Pol, Az, chr(176), Band))
 
 # x-axis parameters
-x = arange(0, len(Files), 1)
 ax.set_xlabel("Time (Mauritius local time - hh:mm)")
-ax.set_xticks(arange(0, len(Files), 8))  # a tick every 2 hours
-datelist = [(StartTime + i*timedelta(minutes = 60)).strftime("%H:%M") for i in range(0,24,2)]
+xticks = arange(0, len(Files), 8)  # a tick every 2 hours
+ax.set_xticks(xticks)
+datelist = [(StartTime + int(i)*timedelta(minutes = 15)).strftime("%H:%M") for i in xticks]
 ax.set_xticklabels(datelist)
 
 # y-axis parameters
-y = arange(0, 461, 1)
 ax.set_ylabel("Frequency")
 
 if Band == "0":
@@ -529,11 +570,20 @@ else:
 ax.yaxis.set_major_formatter(formatter)
 
 # Create image
-img = ax.pcolormesh(x, Frequency, InputData, cmap=cmap, norm=norm)
+# The time and frequency grids are uniform, so the data is drawn as a single
+# image; the extent puts the centre of each pixel on its time and frequency.
+dFreq = (Frequency[-1] - Frequency[0]) / (len(Frequency) - 1)
+img = ax.imshow(InputData, origin='lower', aspect='auto', interpolation='nearest', extent=[-0.5, len(Files) - 0.5, Frequency[0] - 0.5*dFreq, Frequency[-1] + 0.5*dFreq], cmap=cmap, norm=norm)
 fig.colorbar(img, ax=ax, label="dB", aspect=40)
 
 plt.tight_layout()
-plt.show()
+
+if Headless:
+    plotfilename = argv[1] + "_" + Pol + Az + "_" + Band + "_spectrogram.png"
+    print("No display available, saving plot to {:s}".format(plotfilename))
+    fig.savefig(plotfilename, dpi=150)
+else:
+    plt.show()
 
 ###  END Plotting  ###
 
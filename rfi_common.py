@@ -0,0 +1,292 @@
+#
+#  Helpers shared by the scripts which process the RFI data obtained for
+#  Bras d'Eau, the location of the Mauritius Deuterium Telescope (MDT):
+#  RFI_1Az_1Pol_average, RFI_3Az_2Pol_average and RFI_spectrogram. This file
+#  has to be kept in the same directory as the scripts.
+#
+#  Copyright (c) 2019 Nitish Ragoomundun, Mauritius
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+
+from sys import platform
+from os import path,scandir,stat,cpu_count,environ,getpid,replace,remove
+import re
+from datetime import datetime
+from numpy import loadtxt,load,save,array,array_equal,int64
+
+# Without a display (e.g. batch runs over SSH or from cron), the plots are
+# rendered with the non-interactive Agg backend and saved to PNG files
+# instead of being shown, which skips loading a GUI toolkit.
+# Setting the environment variable RFI_BATCH to a non-empty value does the
+# same even when a display is available.
+global Headless
+Headless = environ.get("RFI_BATCH", "") != "" or (platform.startswith("linux") and "DISPLAY" not in environ and "WAYLAND_DISPLAY" not in environ)
+
+
+###
+###  Constants
+###
+
+# Number of data values in each TXT data file
+# This is the number of frequency values at which power was measured.
+global NumRows
+NumRows = 461
+
+# Noise floor level of the spectrum analyzer was at -120dB
+# So, we assumed that if on average, signal was below -118 dB,
+# it means that amplifier was not functioning properly.
+global SpectrumFloor
+SpectrumFloor = -118.0
+
+# Number of threads used to read the data files concurrently
+global NumThreads
+NumThreads = min(32, 4*(cpu_count() or 1))
+
+# Cache the power values of each data file in a .npy file next to it
+# Setting the environment variable RFI_NOCACHE to a non-empty value disables
+# the cache: the data files are always parsed and no .npy file is written.
+global CacheData
+CacheData = environ.get("RFI_NOCACHE", "") == ""
+
+
+###
+###  Functions
+###
+
+###  BEGIN Function: Construct filename suffix  ###
+#
+#  Returns the end of the names of the data files for the given polarisation,
+#  direction and band, which follows the time stamp (e.g. "H000_1.TXT").
+#
+def construct_suffix(Pol, Az, Band):
+    Suffix = Pol
+
+    if Az == "0":
+        Suffix += "000"
+    else:
+        Suffix += Az
+
+    if Band != "0":
+        Suffix += "_" + Band
+
+    return(Suffix + ".TXT")
+
+###  END Function: Construct filename suffix  ###
+
+
+
+###  BEGIN Function: Construct filename pattern  ###
+#
+#  Returns compiled regular expression matching the names of the data files
+#  for the given polarisation, direction and band. The time stamp of a file,
+#  in format YYYYMMDD_HHMM, is captured as group 1 of the match.
+#
+def construct_pattern(Pol, Az, Band):
+    return(re.compile(r"MRT_(\d{8}_\d{4})" + re.escape(construct_suffix(Pol, Az, Band))))
+
+###  END Function: Construct filename pattern  ###
+
+
+
+###  BEGIN Function: List files in data directory  ###
+#
+#  Returns the sorted list of names of the files in DataPath. The directory
+#  is listed only once, however many configurations are searched.
+#
+def list_datafiles(DataPath):
+    Existing = []
+    with scandir(DataPath) as Entries:
+        for Entry in Entries:
+            if Entry.is_file():
+                Existing.append(Entry.name)
+
+    Existing.sort()
+    return(Existing)
+
+###  END Function: List files in data directory  ###
+
+
+
+###  BEGIN Function: Find files and make list  ###
+#
+#  Returns list of files, start time (time stamp for the first data file),
+#  and end time (time stamp for last data file)
+#  The list is of length NumFiles - the number of data files available for the
+#  input parameters, sorted in time.
+#  Existing is the sorted list of names of the files in DataPath, as returned
+#  by list_datafiles(). Since the names of the files of a configuration only
+#  differ by their time stamps, in format YYYYMMDD_HHMM, they are in time
+#  order in the list and the time range is checked by comparing the time
+#  stamps as strings; only those of the first and last files are parsed.
+#
+def find_files(StartTime, EndTime, Pol, Az, Band, DataPath, Existing):
+    if DataPath[-1] == "/":
+        Prefix = DataPath
+    else:
+        Prefix = DataPath + "/"
+
+    Pattern = construct_pattern(Pol, Az, Band)
+    StartStamp = StartTime.strftime("%Y%m%d_%H%M")
+    EndStamp = EndTime.strftime("%Y%m%d_%H%M")
+
+    # Create list
+    List = []
+
+    for Filename in Existing:
+        Match = Pattern.fullmatch(Filename)
+        if Match is not None and StartStamp <= Match.group(1) <= EndStamp:
+            List.append(Prefix + Filename)
+            LastStamp = Match.group(1)
+
+            if len(List) == 1:
+                FirstStamp = LastStamp
+
+    if len(List) == 0:
+        raise FileNotFoundError
+
+    if len(List) <= 1:
+        raise IndexError
+
+    StartTime = datetime.strptime(FirstStamp, "%Y%m%d_%H%M")
+    EndTime = datetime.strptime(LastStamp, "%Y%m%d_%H%M")
+    return(List, StartTime, EndTime)
+
+###  END Function: Find files and make list  ###
+
+
+
+###  BEGIN Function: Stamp of data file  ###
+#
+#  Returns numpy array holding the size and the modification time, in
+#  nanoseconds, of the data file. The stamp is saved with the cache of the
+#  file, which is only used while the stamp of the file is unchanged.
+#
+def file_stamp(Filename):
+    Stat = stat(Filename)
+    return(array([Stat.st_size, Stat.st_mtime_ns], dtype=int64))
+
+###  END Function: Stamp of data file  ###
+
+
+
+###  BEGIN Function: Load cached power values  ###
+#
+#  Returns the power values of the data file saved in Filename.npy by
+#  save_cache(), or None if CacheData is not set, or if the cache file is
+#  missing, unreadable, empty or of the wrong length, or if the size or the
+#  modification time of the data file differ from those saved in the cache
+#  (e.g. data file replaced by a copy which kept the time of the original).
+#
+def load_cache(Filename):
+    if not CacheData:
+        return(None)
+
+    try:
+        with open(Filename + ".npy", 'rb') as fin:
+            Stamp = load(fin)
+            Power = load(fin)
+
+        if array_equal(Stamp, file_stamp(Filename)) and Power.shape == (NumRows,):
+            return(Power)
+    except (OSError, ValueError, EOFError):
+        pass
+
+    return(None)
+
+###  END Function: Load cached power values  ###
+
+
+
+###  BEGIN Function: Save power values to cache  ###
+#
+#  If CacheData is set, saves the stamp of the data file, as returned by
+#  file_stamp() before the file was read, followed by its power values, in
+#  binary format to Filename.npy. The cache is simply not written if it
+#  cannot be (e.g. read-only data directory).
+#  The values are written to a hidden temporary file in the same directory,
+#  named after the process, which then replaces Filename.npy, so that another
+#  run never reads a partly written cache file.
+#
+def save_cache(Filename, Power, Stamp):
+    if CacheData:
+        TempName = path.join(path.dirname(Filename), ".{:d}.{:s}.npy".format(getpid(), path.basename(Filename)))
+        try:
+            with open(TempName, 'wb') as fout:
+                save(fout, Stamp)
+                save(fout, Power)
+
+            replace(TempName, Filename + ".npy")
+        except OSError:
+            try:
+                remove(TempName)
+            except OSError:
+                pass
+
+###  END Function: Save power values to cache  ###
+
+
+
+###  BEGIN Function: Read power values from data file  ###
+#
+#  Returns a numpy array of length NumRows holding the power values (column 1)
+#  of the data file.
+#  The values are loaded from the cache if possible, otherwise they are
+#  parsed from the data file and saved to the cache for later runs.
+#
+def read_power(Filename):
+    Power = load_cache(Filename)
+
+    if Power is None:
+        Stamp = file_stamp(Filename)
+        Power = loadtxt(fname=Filename, delimiter=',', usecols=1, max_rows=NumRows)
+        save_cache(Filename, Power, Stamp)
+
+    return(Power)
+
+###  END Function: Read power values from data file  ###
+
+
+
+###  BEGIN Function: Check if amplifier was working correctly  ###
+#
+#  Takes the column of power values read from a data file.
+#  Returns: 0 if data valid,
+#           1 if invalid data values due to amplifier malfunction.
+#
+def CheckAmp(Power):
+
+    # Mean over all data points
+    Mean = Power.mean()
+
+    if Mean <= SpectrumFloor:
+        return(1)
+    else:
+        return(0)
+
+###  END Function: Check if amplifier was working correctly  ###
+
+
+
+###  BEGIN Function: Load amplifier gain data  ###
+#
+#  Returns array of length NumRows holding the gain of the amplifier at each
+#  frequency of the band.
+#
+def load_AmpGain(Band):
+    AmpGain = loadtxt(fname="AmpGain_band"+Band+".csv", delimiter=',', usecols=1)
+    return(AmpGain)
+
+###  END Function: Load amplifier gain data  ###